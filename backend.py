@@ -5,21 +5,56 @@ Flask API server for handling Gemini API calls and content recommendations
 """
 
 import os
+import atexit
+import logging
+import logging.handlers
+import queue
 import uuid
 import json
 import re
-from dataclasses import asdict
 from datetime import datetime
+from functools import lru_cache
 
 from flask import Flask, request, jsonify, send_from_directory, Response, stream_template
 from flask_cors import CORS
 from cachetools import TTLCache
 
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
 # Import our simplified modules
-from config import SECRET_KEY, DEBUG, PORT, CACHE_TTL, MAX_CACHE_SIZE
-from data_models import ContentItem
-from content_validator import ContentValidator
-from gemini_service import GeminiContentService
+from config import SECRET_KEY, DEBUG, PORT, CACHE_TTL, MAX_CACHE_SIZE, LOG_LEVEL
+from gemini_service import GeminiContentService, article_chat_id
+
+_log_listener = None
+
+
+def _configure_logging():
+    """Route log records through a queue drained by this process's own listener thread.
+
+    Handlers only enqueue records, so request and validator threads never block on
+    the stream lock. Listener threads don't survive fork(), so a forked child runs
+    this again and replaces the inherited handler with a fresh queue and listener.
+    """
+    global _log_listener
+    log_queue = queue.SimpleQueue()
+    logging.basicConfig(level=LOG_LEVEL, handlers=[logging.handlers.QueueHandler(log_queue)], force=True)
+    _log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler())
+    _log_listener.start()
+
+
+def _stop_logging():
+    """Flush queued records at exit"""
+    if _log_listener is not None:
+        _log_listener.stop()
+
+
+_configure_logging()
+os.register_at_fork(after_in_child=_configure_logging)
+atexit.register(_stop_logging)
+logger = logging.getLogger('backend')
 
 # Initialize Flask app
 app = Flask(__name__, static_folder='.')
@@ -31,8 +66,186 @@ gemini_service = GeminiContentService()
 cache = TTLCache(maxsize=MAX_CACHE_SIZE, ttl=CACHE_TTL)
 cache_stats = {"hits": 0, "misses": 0}
 
+# Gemini API keys are URL-safe tokens (39 chars today); reject obvious garbage early
+_API_KEY_RE = re.compile(r'[A-Za-z0-9_-]{20,}')
+
+# Characters the streaming array scanner has to act on, outside and inside strings
+_ARRAY_TOKEN_RE = re.compile(rb'["\[\]]')
+_STRING_SPECIAL_RE = re.compile(rb'["\\]')
+
+# Pre-built SSE frame for the payload-free completion event
+_SSE_COMPLETE = b'data: {"type":"complete"}\n\n'
+
 
 # Helper functions
+_REQUIRED_FIELD_LABELS = {
+    'api_key': 'API key',
+    'query': 'Query',
+    'message': 'Message',
+    'article': 'Article context',
+}
+
+
+def _require_fields(data: dict, *fields: str):
+    """Return a 400 response for the first missing or blank field, or None if all are present"""
+    for field in fields:
+        value = data.get(field)
+        if not value or (isinstance(value, str) and not value.strip()):
+            return jsonify({"error": f"{_REQUIRED_FIELD_LABELS[field]} is required"}), 400
+    return None
+
+
+if orjson is not None:
+    _json_bytes = orjson.dumps
+    _json_loads = orjson.loads
+else:
+    def _json_bytes(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    _json_loads = json.loads
+
+
+def _sse(event: dict) -> bytes:
+    """Encode an event dict as a UTF-8 SSE frame"""
+    return b'data: ' + _json_bytes(event) + b'\n\n'
+
+
+def _sse_text_event(event_type: str, text: str) -> bytes:
+    """Build an SSE frame for a {"type": ..., "content": <text>} event.
+
+    Only the text is JSON-encoded, which is much cheaper than encoding a
+    dict on the per-chunk path and keeps the frame compact.
+    """
+    return b'data: {"type":"' + event_type.encode() + b'","content":' + _json_bytes(text) + b'}\n\n'
+
+
+def _build_results_payload(items):
+    """Shape validated items into the plain result dicts sent to the frontend"""
+    clean_metadata = gemini_service._clean_metadata_from_text
+    return [
+        {
+            'title': item.get('title', ''),
+            'type': item.get('type', ''),
+            'description': clean_metadata(item.get('description', '')),
+            'source': item.get('source', ''),
+            'relevance': item.get('relevance', ''),
+            'url': item.get('url', ''),
+            'validation': item.get('validation')
+        }
+        for item in items
+    ]
+
+
+@lru_cache(maxsize=1)
+def _mock_results_frame() -> bytes:
+    """SSE results frame for the static mock results, encoded once on first use"""
+    return _sse({'type': 'results', 'content': _build_results_payload(gemini_service._get_mock_results())})
+
+
+def _split_chunk_parts(chunk):
+    """Split a Gemini streaming chunk into (thinking_text, content_text)"""
+    # According to Gemini API docs, response has candidates[] with content.parts[]
+    try:
+        parts = chunk.candidates[0].content.parts
+        thinking_text = ''.join([part.text for part in parts if part.text and getattr(part, 'thought', False)]) or None
+        content_text = ''.join([part.text for part in parts if part.text and not getattr(part, 'thought', False)]) or None
+    except (AttributeError, IndexError, TypeError):
+        thinking_text = content_text = None
+
+    # Fallback: try direct text access (for compatibility)
+    if not content_text:
+        content_text = getattr(chunk, 'text', None)
+
+    return thinking_text, content_text
+
+
+class _StreamingArrayExtractor:
+    """Incrementally find and parse the first complete JSON array in streamed text.
+
+    Each fed character is scanned at most once, tracking bracket depth and
+    string/escape state across chunks, so json.loads only runs when the
+    outer array has balanced. Runs of uninteresting characters are skipped
+    by precompiled regex searches, so the Python loop only visits brackets,
+    quotes and escapes.
+    """
+    __slots__ = ('buf', 'start', 'depth', 'in_str', 'escape', 'done', 'value')
+
+    def __init__(self):
+        self.buf = bytearray()
+        self.start = None
+        self.depth = 0
+        self.in_str = False
+        self.escape = False
+        self.done = False
+        self.value = None
+
+    def feed(self, text: str) -> bool:
+        """Append a chunk of text; returns True once an array has been parsed"""
+        if self.done or not text:
+            return self.done
+
+        buf = self.buf
+        i = len(buf)
+        # Grow one UTF-8 buffer in place; multi-byte sequences never contain the ASCII
+        # quote, bracket or backslash bytes, so scanning bytes is safe
+        buf.extend(text.encode('utf-8'))
+        n = len(buf)
+        token_search = _ARRAY_TOKEN_RE.search
+        string_search = _STRING_SPECIAL_RE.search
+
+        while i < n:
+            if self.start is None:
+                # Look for the opening bracket of the array
+                i = buf.find(b'[', i)
+                if i == -1:
+                    return False
+                self.start = i
+                self.depth = 1
+                i += 1
+                continue
+
+            if self.escape:
+                self.escape = False
+                i += 1
+                continue
+
+            if self.in_str:
+                # Jump straight to the next quote or escape inside the string
+                match = string_search(buf, i)
+                if match is None:
+                    return False
+                if match.group() == b'\\':
+                    self.escape = True
+                else:
+                    self.in_str = False
+                i = match.end()
+                continue
+
+            # Skip whitespace, numbers, keys and punctuation in C to the next token that matters
+            match = token_search(buf, i)
+            if match is None:
+                return False
+            i = match.start()
+            char = match.group()
+            if char == b'"':
+                self.in_str = True
+            elif char == b'[':
+                self.depth += 1
+            elif char == b']':
+                self.depth -= 1
+                if self.depth == 0:
+                    try:
+                        value = _json_loads(buf[self.start:i + 1])
+                    except json.JSONDecodeError:
+                        value = None
+                    if isinstance(value, list) and all(isinstance(item, dict) for item in value):
+                        self.value = value
+                        self.done = True
+                        return True
+                    # Not the results array (e.g. a citation like [Search 1]), keep scanning
+                    self.start = None
+            i += 1
+
+        return False
 
 
 # Routes
@@ -51,22 +264,22 @@ def serve_static(filename):
 @app.route('/api/configure', methods=['POST'])
 def configure_api():
     """Configure the API key"""
-    data = request.get_json()
-    api_key = data.get('api_key')
-    
-    if not api_key:
-        return jsonify({"error": "API key is required"}), 400
+    data = request.get_json(silent=True) or {}
+    error = _require_fields(data, 'api_key')
+    if error:
+        return error
     
     # Basic validation of API key format
-    if not api_key.strip() or len(api_key.strip()) < 10:
+    api_key = data['api_key'].strip()
+    if not _API_KEY_RE.fullmatch(api_key):
         return jsonify({"error": "Invalid API key format"}), 400
     
     try:
-        gemini_service.set_api_key(api_key.strip())
-        print(f"API key configured successfully")
+        gemini_service.set_api_key(api_key)
+        logger.info("API key configured successfully")
         return jsonify({"message": "API key configured successfully"})
     except Exception as e:
-        print(f"Failed to configure API key: {e}")
+        logger.warning("Failed to configure API key: %s", e)
         return jsonify({"error": f"Failed to configure API key: {str(e)}"}), 500
 
 
@@ -74,33 +287,26 @@ def configure_api():
 def reset_api_key():
     """Reset the API key - clears it from backend memory"""
     try:
-        # Clear the API key from the service
-        gemini_service.api_key = None
-        print(f"API key reset in backend")
+        # Clear the API key, and the clients built with it, from the service
+        gemini_service.reset_api_key()
+        logger.info("API key reset in backend")
         return jsonify({"message": "API key reset successfully"})
     except Exception as e:
-        print(f"Failed to reset API key: {e}")
+        logger.warning("Failed to reset API key: %s", e)
         return jsonify({"error": f"Failed to reset API key: {str(e)}"}), 500
 
 @app.route('/api/search/stream', methods=['POST'])
 def search_content_streaming():
     """Search for content with streaming responses"""
-    data = request.get_json()
-    query = data.get('query', '').strip()
-    api_key = data.get('api_key')  # Get API key from request
-    
-    if not query:
-        return jsonify({"error": "Query is required"}), 400
-    
-    if not api_key:
-        return jsonify({"error": "API key is required"}), 400
+    data = request.get_json(silent=True) or {}
+    error = _require_fields(data, 'query', 'api_key')
+    if error:
+        return error
+    query, api_key = data['query'].strip(), data['api_key']
     
     def generate_stream():
         try:
-            print(f"Starting streaming search for query: {query}")
-            
-            # Configure API key for this request
-            gemini_service.set_api_key(api_key)
+            logger.info("Starting streaming search for query: %s", query)
             
             # Simplified memory context for streaming (avoid session dependencies)
             memory_context = {
@@ -109,98 +315,56 @@ def search_content_streaming():
                 'topics': []
             }
             
-            accumulated_content = ""
+            extractor = _StreamingArrayExtractor()
             results_sent = False
             thinking_sent = False
             
             # Send initial thinking message
             if not thinking_sent:
                 initial_thought = f'Analyzing your query "{query}" to find the most relevant and current content...'
-                yield f"data: {json.dumps({'type': 'thought', 'content': initial_thought})}\n\n"
+                yield _sse_text_event('thought', initial_thought)
                 thinking_sent = True
             
             # Stream responses from Gemini
-            print(f"Starting streaming from Gemini service...")
-            for chunk in gemini_service.search_content_streaming(query, memory_context):
-                print(f"Received chunk: {type(chunk)}")
-
-                # Extract thinking content first
-                thinking_text = None
-                content_text = None
-                
-                # According to Gemini API docs, response has candidates[] with content.parts[]
-                if hasattr(chunk, 'candidates') and chunk.candidates:
-                    candidate = chunk.candidates[0]  # Use first candidate
-                    if hasattr(candidate, 'content') and candidate.content:
-                        if hasattr(candidate.content, 'parts') and candidate.content.parts:
-                            # Separate thinking and regular content parts
-                            thinking_parts = []
-                            text_parts = []
-                            for part in candidate.content.parts:
-                                if hasattr(part, 'text') and part.text:
-                                    # Check if this is a thinking part
-                                    if hasattr(part, 'thought') and part.thought:
-                                        thinking_parts.append(part.text)
-                                    else:
-                                        text_parts.append(part.text)
-                            
-                            thinking_text = ''.join(thinking_parts) if thinking_parts else None
-                            content_text = ''.join(text_parts) if text_parts else None
-                
-                # Fallback: try direct text access (for compatibility)
-                if not content_text and hasattr(chunk, 'text'):
-                    content_text = chunk.text
+            logger.debug("Starting streaming from Gemini service...")
+            # Bind per-chunk helpers once instead of resolving globals on every chunk
+            split_chunk_parts = _split_chunk_parts
+            text_event = _sse_text_event
+            for chunk in gemini_service.search_content_streaming(query, memory_context, api_key):
+                thinking_text, content_text = split_chunk_parts(chunk)
 
                 # Send thinking content if available
                 if thinking_text:
-                    yield f"data: {json.dumps({'type': 'thought', 'content': thinking_text})}\n\n"
-                else:
-                    print(f"No thinking content found in this chunk")
+                    yield text_event('thought', thinking_text)
 
                 if content_text:
-                    accumulated_content += str(content_text)
-                    # print(f"Accumulated content length: {len(accumulated_content)}")
-                    # print(f"Latest content: {str(content_text)[:100]}...")
-                    
-                    # Try to parse complete JSON if we have enough content
+                    # Try to parse complete JSON once the outer array has balanced
                     try:
-                        json_match = re.search(r'\[[\s\S]*\]', accumulated_content)
-                        if json_match and not results_sent:
-                            results_data = json.loads(json_match.group(0))
-                            print(f"Parsed {len(results_data)} results from accumulated content")
+                        if extractor.feed(content_text) and not results_sent:
+                            results_data = extractor.value
+                            logger.info("Parsed %d results from accumulated content", len(results_data))
                             
                             # Send parsing complete event to update UI
-                            yield f"data: {json.dumps({'type': 'parsing_complete', 'content': len(results_data)})}\n\n"
+                            yield _sse({'type': 'parsing_complete', 'content': len(results_data)})
                             
                             # Validate content URLs
-                            print(f"Validating {len(results_data)} search results...")
+                            logger.debug("Validating %d search results...", len(results_data))
                             validated_data = gemini_service.validator.validate_content_batch(results_data)
                             
                             if not validated_data and results_data:
-                                print("Using mock results as fallback")
+                                logger.warning("Using mock results as fallback")
                                 validated_data = gemini_service._get_mock_results()
                             
-                            # Convert to ContentItem objects
-                            results = []
-                            for item in validated_data:
-                                filtered_item = {
-                                    'title': item.get('title', ''),
-                                    'type': item.get('type', ''),
-                                    'description': gemini_service._clean_metadata_from_text(item.get('description', '')),
-                                    'source': item.get('source', ''),
-                                    'relevance': item.get('relevance', ''),
-                                    'url': item.get('url', ''),
-                                    'validation': item.get('validation')
-                                }
-                                results.append(ContentItem(**filtered_item))
+                            # Shape into plain result dicts for the frontend
+                            results = _build_results_payload(validated_data)
                             
-                            print(f"Sending {len(results)} results to frontend")
+                            logger.info("Sending %d results to frontend", len(results))
                             # Send results
-                            yield f"data: {json.dumps({'type': 'results', 'content': [asdict(item) for item in results]})}\n\n"
+                            yield _sse({'type': 'results', 'content': results})
                             results_sent = True
                             break
                     except (json.JSONDecodeError, KeyError) as e:
-                        print(f"JSON parse error: {e}")
+                        logger.warning("JSON parse error: %s", e)
                         # Continue accumulating content
                         continue
             
@@ -208,30 +372,16 @@ def search_content_streaming():
             
             # If no results were sent (maybe API failed), send mock results
             if not results_sent:
-                print("No results sent yet, sending mock results")
-                mock_results = gemini_service._get_mock_results()
-                results = []
-                for item in mock_results:
-                    filtered_item = {
-                        'title': item.get('title', ''),
-                        'type': item.get('type', ''),
-                        'description': gemini_service._clean_metadata_from_text(item.get('description', '')),
-                        'source': item.get('source', ''),
-                        'url': item.get('url', ''),
-                        'relevance': item.get('relevance', ''),
-                        'validation': item.get('validation')
-                    }
-                    results.append(ContentItem(**filtered_item))
-                
-                yield f"data: {json.dumps({'type': 'results', 'content': [asdict(item) for item in results]})}\n\n"
+                logger.warning("No results sent yet, sending mock results")
+                yield _mock_results_frame()
             
             # Send completion signal
-            print("Sending completion signal")
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            logger.debug("Sending completion signal")
+            yield _SSE_COMPLETE
             
         except Exception as e:
-            print(f"Streaming error: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            logger.error("Streaming error: %s", e)
+            yield _sse_text_event('error', str(e))
     
     return Response(generate_stream(), mimetype='text/event-stream', headers={
         'Cache-Control': 'no-cache',
@@ -241,18 +391,15 @@ def search_content_streaming():
 @app.route('/api/recommendations/stream', methods=['POST'])
 def get_recommendations_streaming():
     """Get personalized recommendations with streaming responses"""
-    data = request.get_json()
-    api_key = data.get('api_key')  # Get API key from request
-    
-    if not api_key:
-        return jsonify({"error": "API key is required"}), 400
+    data = request.get_json(silent=True) or {}
+    error = _require_fields(data, 'api_key')
+    if error:
+        return error
+    api_key = data['api_key']
         
     def generate_stream_attempt():
         try:
-            print(f"Starting streaming recommendations")
-            
-            # Configure API key for this request
-            gemini_service.set_api_key(api_key)
+            logger.info("Starting streaming recommendations")
             
             # Simplified memory context for streaming (avoid session dependencies)
             memory_context = {
@@ -261,79 +408,65 @@ def get_recommendations_streaming():
                 'topics': []
             }
             
-            accumulated_content = ""
+            extractor = _StreamingArrayExtractor()
             results_sent = False
             thinking_sent = False
             
             # Send initial thinking message
             if not thinking_sent:
                 initial_thought = 'Analyzing current AI trends and developments to provide you with the most relevant recommendations...'
-                yield f"data: {json.dumps({'type': 'thought', 'content': initial_thought})}\n\n"
+                yield _sse_text_event('thought', initial_thought)
                 thinking_sent = True
             
             # Stream responses from Gemini
-            print(f"Starting streaming from Gemini service...")
+            logger.debug("Starting streaming from Gemini service...")
             try:
+                # Bind per-chunk helpers once instead of resolving globals on every chunk
+                split_chunk_parts = _split_chunk_parts
+                text_event = _sse_text_event
+                log_chunks = logger.isEnabledFor(logging.DEBUG)
                 chunk_count = 0
-                for chunk in gemini_service.get_recommendations_streaming(memory_context):
+                for chunk in gemini_service.get_recommendations_streaming(memory_context, api_key):
                     chunk_count += 1
 
-                    # Extract thinking content first
-                    thinking_text = None
-                    content_text = None
-                    
-                    # According to Gemini API docs, response has candidates[] with content.parts[]
-                    if hasattr(chunk, 'candidates') and chunk.candidates:
-                        candidate = chunk.candidates[0]  # Use first candidate
-                        if hasattr(candidate, 'content') and candidate.content:
-                            if hasattr(candidate.content, 'parts') and candidate.content.parts:
-                                # Separate thinking and regular content parts
-                                thinking_parts = []
-                                text_parts = []
-                                for part in candidate.content.parts:
-                                    if hasattr(part, 'text') and part.text:
-                                        # Check if this is a thinking part
-                                        if hasattr(part, 'thought') and part.thought:
-                                            thinking_parts.append(part.text)
-                                        else:
-                                            text_parts.append(part.text)
-                                
-                                thinking_text = ''.join(thinking_parts) if thinking_parts else None
-                                content_text = ''.join(text_parts) if text_parts else None
-                    
-                    # Fallback: try direct text access (for compatibility)
-                    if not content_text and hasattr(chunk, 'text'):
-                        content_text = chunk.text
+                    thinking_text, content_text = split_chunk_parts(chunk)
 
                     # Send thinking content if available
                     if thinking_text:
-                        print(f"Found thinking content, sending: {thinking_text[:100]}...")
-                        yield f"data: {json.dumps({'type': 'thought', 'content': thinking_text})}\n\n"
-                    else:
-                        print(f"No thinking content found in this chunk")
+                        if log_chunks:
+                            logger.debug("Found thinking content, sending: %s...", thinking_text[:100])
+                        yield text_event('thought', thinking_text)
                     
                     # Process the content text
                     if content_text:
-                        accumulated_content += str(content_text)
-                        print(f"Accumulated content length: {len(accumulated_content)}")
-                        print(f"Latest content: {str(content_text)[:100]}...")
+                        extractor.feed(content_text)
+                        if log_chunks:
+                            logger.debug("Latest content: %s...", content_text[:100])
 
-                print(f"Last content_text: {content_text}")
+                logger.debug("Last content_text: %s", content_text)
                 
-                print(f"Accumulated content: {accumulated_content}")
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("Accumulated content: %s", extractor.buf.decode('utf-8'))
                 # Try to parse complete JSON now that we have all of the chunks
                 try:
-                    json_match = re.search(r'\[[\s\S]*\]', accumulated_content)
-                    if json_match and not results_sent:
-                        results_data = json.loads(json_match.group(0))
-                        print(f"Parsed {len(results_data)} results from accumulated content")
+                    results_data = None
+                    if extractor.done:
+                        results_data = extractor.value
+                    else:
+                        # Fall back to the span between the first '[' and the last ']'
+                        start = extractor.buf.find(b'[')
+                        end = extractor.buf.rfind(b']')
+                        if 0 <= start < end:
+                            results_data = _json_loads(extractor.buf[start:end + 1])
+                    if results_data is not None and not results_sent:
+                        logger.info("Parsed %d results from accumulated content", len(results_data))
                         
                         # Send parsing complete event to update UI
-                        yield f"data: {json.dumps({'type': 'parsing_complete', 'content': len(results_data)})}\n\n"
+                        yield _sse({'type': 'parsing_complete', 'content': len(results_data)})
                         
                         # Generate links by title (like in original recommendations)
-                        print(f"Generating links for {len(results_data)} results...")
-                        links_dict = gemini_service.generate_links_by_title_parallel(results_data)
+                        logger.debug("Generating links for %d results...", len(results_data))
+                        links_dict = gemini_service.generate_links_by_title_parallel(results_data, api_key)
                         
                         validated_data = results_data
                         for item in validated_data:
@@ -343,62 +476,37 @@ def get_recommendations_streaming():
                                 item['url'] = f"https://www.google.com/search?q={item['title']}+{item['source']}"
                         
                         if not validated_data and results_data:
-                            print("Using mock results as fallback")
+                            logger.warning("Using mock results as fallback")
                             validated_data = gemini_service._get_mock_results()
                         
-                        # Convert to ContentItem objects
-                        results = []
-                        for item in validated_data:
-                            filtered_item = {
-                                'title': item.get('title', ''),
-                                'type': item.get('type', ''),
-                                'description': gemini_service._clean_metadata_from_text(item.get('description', '')),
-                                'source': item.get('source', ''),
-                                'url': item.get('url', ''),
-                                'relevance': item.get('relevance', ''),
-                                'validation': item.get('validation')
-                            }
-                            results.append(ContentItem(**filtered_item))
+                        # Shape into plain result dicts for the frontend
+                        results = _build_results_payload(validated_data)
                         
-                        print(f"Sending {len(results)} results to frontend")
+                        logger.info("Sending %d results to frontend", len(results))
                         # Send results
-                        yield f"data: {json.dumps({'type': 'results', 'content': [asdict(item) for item in results]})}\n\n"
+                        yield _sse({'type': 'results', 'content': results})
                         results_sent = True
                 except (json.JSONDecodeError, KeyError) as e:
-                    print(f"JSON parse error: {e}")    
-                print(f"Processed {chunk_count} chunks from Gemini service")
+                    logger.warning("JSON parse error: %s", e)
+                logger.info("Processed %d chunks from Gemini service", chunk_count)
                 
             except Exception as api_error:
-                print(f"Gemini streaming failed: {api_error}, using fallback")
+                logger.warning("Gemini streaming failed: %s, using fallback", api_error)
                 # If the API fails completely, we'll fall through to the fallback logic below
             
 
             
             # If no results were sent (maybe API failed), send mock results
             if not results_sent:
-                print("No results sent yet, sending mock results")
-                mock_results = gemini_service._get_mock_results()
-                results = []
-                for item in mock_results:
-                    filtered_item = {
-                        'title': item.get('title', ''),
-                        'type': item.get('type', ''),
-                        'description': gemini_service._clean_metadata_from_text(item.get('description', '')),
-                        'source': item.get('source', ''),
-                        'url': item.get('url', ''),
-                        'relevance': item.get('relevance', ''),
-                        'validation': item.get('validation')
-                    }
-                    results.append(ContentItem(**filtered_item))
-                
-                yield f"data: {json.dumps({'type': 'results', 'content': [asdict(item) for item in results]})}\n\n"
+                logger.warning("No results sent yet, sending mock results")
+                yield _mock_results_frame()
             
             # Send completion signal
-            print("Sending completion signal")
-            yield f"data: {json.dumps({'type': 'complete'})}\n\n"
+            logger.debug("Sending completion signal")
+            yield _SSE_COMPLETE
             
         except Exception as e:
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            yield _sse_text_event('error', str(e))
 
     return Response(generate_stream_attempt(), mimetype='text/event-stream', headers={
         'Cache-Control': 'no-cache',
@@ -445,37 +553,29 @@ def get_chat_history(chat_id):
         history = gemini_service.get_chat_history(chat_id)
         return jsonify({"history": history})
     except Exception as e:
-        print(f"Failed to get chat history: {e}")
+        logger.warning("Failed to get chat history: %s", e)
         return jsonify({"error": f"Failed to get chat history: {str(e)}"}), 500
 
 @app.route('/api/chat/stream', methods=['POST'])
 def chat_with_article_streaming():
     """Multi-turn conversation about an article with streaming response"""
-    data = request.get_json()
-    message = data.get('message', '').strip()
-    article = data.get('article', {})
+    data = request.get_json(silent=True) or {}
+    logger.debug("Initial request: %s", request)
+    logger.debug("Initial data: %s", data)
+    
+    error = _require_fields(data, 'message', 'api_key', 'article')
+    if error:
+        return error
+    message, article, api_key = data['message'].strip(), data['article'], data['api_key']
     conversation_history = data.get('conversation_history', [])
-    api_key = data.get('api_key')  # Get API key from request
-    print(f"Initial request: {request}")
-    print(f"Initial data: {data}")
     
     # DEBUG: Log the incoming streaming request
-    print(f"Streaming chat request received:")
-    print(f"   Message: {message}")
-    print(f"   Article keys: {list(article.keys()) if article else 'None'}")
-    print(f"   Article title: {article.get('title', 'Missing') if article else 'No article'}")
-    print(f"   Article URL: {article.get('url', 'Missing') if article else 'No article'}")
-    print(f"   Conversation history length: {len(conversation_history)} (will be managed by persistent chat session)")
-    
-    if not message:
-        return jsonify({"error": "Message is required"}), 400
-    
-    if not api_key:
-        return jsonify({"error": "API key is required"}), 400
-    
-    if not article:
-        print("No article provided in streaming request")
-        return jsonify({"error": "Article context is required"}), 400
+    logger.debug("Streaming chat request received:")
+    logger.debug("   Message: %s", message)
+    logger.debug("   Article keys: %s", list(article.keys()))
+    logger.debug("   Article title: %s", article.get('title', 'Missing'))
+    logger.debug("   Article URL: %s", article.get('url', 'Missing'))
+    logger.debug("   Conversation history length: %d (will be managed by persistent chat session)", len(conversation_history))
     
     def generate_chat_stream():
         try:
@@ -485,67 +585,43 @@ def chat_with_article_streaming():
             Description: {article.get('description', '')} \
             URL: {article.get('url', '')}"
             
-            print(f"Starting streaming chat for message: {message}")
-            
-            # Configure API key for this request
-            gemini_service.set_api_key(api_key)
+            logger.info("Starting streaming chat for message: %s", message)
             
-            accumulated_content = ""
+            response_parts = []
             
             # Generate chat_id based on article to maintain session persistence
-            import hashlib
-            chat_id = f"article_{hashlib.md5(str(article.get('title', '') + article.get('url', '')).encode()).hexdigest()}"
+            chat_id = article_chat_id(article)
+            
+            # Bind per-chunk helpers once instead of resolving globals on every chunk
+            split_chunk_parts = _split_chunk_parts
+            text_event = _sse_text_event
+            log_chunks = logger.isEnabledFor(logging.DEBUG)
             
             # Stream responses from Gemini chat API using persistent session
-            for chunk in gemini_service.chat_about_article_streaming(message, article, conversation_history, chat_id):
-                print(f"Received chat chunk: {type(chunk)}")
-                
-                # Extract thinking content and regular content separately
-                thinking_text = None
-                content_text = None
-                
-                # According to Gemini API docs, response has candidates[] with content.parts[]
-                if hasattr(chunk, 'candidates') and chunk.candidates:
-                    candidate = chunk.candidates[0]  # Use first candidate
-                    if hasattr(candidate, 'content') and candidate.content:
-                        if hasattr(candidate.content, 'parts') and candidate.content.parts:
-                            # Separate thinking and regular content parts
-                            thinking_parts = []
-                            text_parts = []
-                            for part in candidate.content.parts:
-                                if hasattr(part, 'text') and part.text:
-                                    # Check if this is a thinking part
-                                    if hasattr(part, 'thought') and part.thought:
-                                        thinking_parts.append(part.text)
-                                    else:
-                                        text_parts.append(part.text)
-                            
-                            thinking_text = ''.join(thinking_parts) if thinking_parts else None
-                            content_text = ''.join(text_parts) if text_parts else None
-                
-                # Fallback: try direct text access (for compatibility)
-                if not content_text and hasattr(chunk, 'text'):
-                    content_text = chunk.text
+            for chunk in gemini_service.chat_about_article_streaming(message, article, conversation_history, chat_id, api_key):
+                thinking_text, content_text = split_chunk_parts(chunk)
 
                 # Send thinking content if available
                 if thinking_text:
-                    print(f"Found thinking content in chat, sending: {thinking_text}")
-                    yield f"data: {json.dumps({'type': 'chat_thought', 'content': thinking_text})}\n\n"
+                    if log_chunks:
+                        logger.debug("Found thinking content in chat, sending: %s", thinking_text)
+                    yield text_event('chat_thought', thinking_text)
 
                 if content_text:
-                    accumulated_content += content_text
-                    print(f"Sending chat chunk: {content_text}...")
+                    response_parts.append(content_text)
+                    if log_chunks:
+                        logger.debug("Sending chat chunk: %s...", content_text)
                     
                     # Send the chunk as streaming data
-                    yield f"data: {json.dumps({'type': 'chat_chunk', 'content': content_text})}\n\n"
+                    yield text_event('chat_chunk', content_text)
             
             # Send completion signal
-            print("Chat streaming completed")
-            yield f"data: {json.dumps({'type': 'chat_complete', 'full_response': accumulated_content})}\n\n"
+            logger.info("Chat streaming completed")
+            yield _sse({'type': 'chat_complete', 'full_response': ''.join(response_parts)})
             
         except Exception as e:
-            print(f"Chat streaming error: {e}")
-            yield f"data: {json.dumps({'type': 'error', 'content': str(e)})}\n\n"
+            logger.error("Chat streaming error: %s", e)
+            yield _sse_text_event('error', str(e))
     
     return Response(generate_chat_stream(), mimetype='text/event-stream', headers={
         'Cache-Control': 'no-cache',
@@ -556,17 +632,20 @@ def chat_with_article_streaming():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
+    # Pruning expired entries is only worth it when a caller asks for an exact count
+    if request.args.get('accurate'):
+        cache.expire()
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "cache_size": len(cache),
+        "cache_size": cache.currsize,
         "cache_stats": cache_stats
     })
 
 
 if __name__ == '__main__':
+    # Development server; production runs this app under gunicorn (see start.sh)
     print(f"Starting Gemini Content Discovery Backend on port {PORT}")
     print(f"Debug mode: {DEBUG}")
     print(f"Frontend will be accessible at: http://localhost:{PORT}")
-    
     app.run(host='0.0.0.0', port=PORT, debug=DEBUG)
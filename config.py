@@ -3,22 +3,43 @@ Config settings for an AI content recommendations app.
 """
 import os
 from datetime import datetime
-
-TODAYS_DATE = datetime.now().strftime("%B %d, %Y")
+from functools import lru_cache
 
 # Flask Configuration
 SECRET_KEY = os.environ.get('SECRET_KEY', 'dev-key-change-in-production')
 DEBUG = os.environ.get('DEBUG', 'False').lower() == 'true'
 PORT = int(os.environ.get('PORT', 8001))
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
 
 # Cache Configuration
 CACHE_TTL = 3600  # 1 hour cache
 MAX_CACHE_SIZE = 1000
 
 # API Configuration
+# On-disk caches live outside the app directory, which Flask serves as static files
+DATA_CACHE_DIR = os.environ.get(
+    'DATA_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'news-finder')
+)
 API_BASE_URL = "https://generativelanguage.googleapis.com/v1beta"
 VALIDATION_TIMEOUT = 10  # seconds for URL validation
-MAX_VALIDATION_WORKERS = 5  # concurrent validation threads
+VALIDATION_CONNECT_TIMEOUT = 5  # seconds to establish a connection during validation
+VALIDATION_BATCH_TIMEOUT = 30  # seconds a whole validation batch may take
+MAX_VALIDATION_WORKERS = 5  # concurrent validations per batch
+VALIDATION_POOL_WORKERS = 40  # validation threads shared by all concurrent batches
+LINK_LOOKUP_WORKERS = 6  # concurrent Gemini calls per request when resolving links by title
+LINK_POOL_WORKERS = 32  # link lookup threads shared by all concurrent requests
+LINK_CACHE_DIR = os.environ.get('LINK_CACHE_DIR', os.path.join(DATA_CACHE_DIR, 'links'))  # diskcache directory; empty disables
+LINK_CACHE_TTL = 24 * 60 * 60  # seconds to reuse a grounded link lookup
+MAX_CHAT_SESSIONS = 256  # article chats kept in memory before the least recently used is dropped
+MAX_CONNECTIONS_PER_HOST = 4  # concurrent validations against a single host
+MAX_TRACKED_HOSTS = 1024  # hosts whose concurrency limits are kept before the least recent is dropped
+VALIDATION_POOL_HOSTS = 32  # hosts to keep keep-alive connection pools for
+VALIDATION_CACHE_SIZE = 4096  # recent URL validation results kept in memory
+VALIDATION_CACHE_TTL = 60 * 60  # seconds before an in-memory validation result is rechecked
+VALIDATION_HTTP_CACHE = os.environ.get('VALIDATION_HTTP_CACHE', 'url_validation')  # sqlite file name in DATA_CACHE_DIR; empty disables
+VALIDATION_HTTP_CACHE_TTL = 6 * 60 * 60  # seconds to reuse a cached validation response
+DNS_CACHE_TTL = 900  # seconds to reuse a resolved hostname
+DNS_CACHE_SIZE = 1024
 
 # Database Configuration removed - no longer using user preferences
 
@@ -30,6 +51,17 @@ may have missed when browsing day to day.
 Today's date is {TODAYS_DATE}.
 """
 
+
+@lru_cache(maxsize=1)
+def _format_system_instructions(todays_date: str) -> str:
+    return SYSTEM_INSTRUCTIONS.format(TODAYS_DATE=todays_date)
+
+
+def get_system_instructions() -> str:
+    """System instructions with today's date filled in, re-rendered only when the date changes"""
+    return _format_system_instructions(datetime.now().strftime("%B %d, %Y"))
+
+
 # Content Source Constraints
 SOURCE_CONSTRAINTS = """
 STRICT SOURCE REQUIREMENTS - Only include content from these reputable sources:
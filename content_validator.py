@@ -1,26 +1,158 @@
 """
 Content validation service for URL validation and accessibility checks.
 """
+import os
 import re
+import socket
+import time
+import logging
+import threading
 import concurrent.futures
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List, Any
-from urllib.parse import urlparse
+from urllib.parse import urlparse, parse_qs, quote
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from cachetools import LRUCache, TTLCache
 
-from config import VALIDATION_TIMEOUT, MAX_VALIDATION_WORKERS
+try:
+    import requests_cache
+except ImportError:  # fall back to an uncached session
+    requests_cache = None
+
+from config import (
+    VALIDATION_CONNECT_TIMEOUT, VALIDATION_TIMEOUT, VALIDATION_BATCH_TIMEOUT,
+    MAX_VALIDATION_WORKERS, VALIDATION_POOL_WORKERS, VALIDATION_POOL_HOSTS,
+    MAX_CONNECTIONS_PER_HOST, MAX_TRACKED_HOSTS,
+    VALIDATION_CACHE_SIZE, VALIDATION_CACHE_TTL, DATA_CACHE_DIR, VALIDATION_HTTP_CACHE,
+    VALIDATION_HTTP_CACHE_TTL,
+    DNS_CACHE_TTL, DNS_CACHE_SIZE
+)
+
+logger = logging.getLogger('content_validator')
+
+# (connect, read) so an unreachable host fails fast instead of using the whole read budget
+_REQUEST_TIMEOUT = (VALIDATION_CONNECT_TIMEOUT, VALIDATION_TIMEOUT)
+
+# Statuses that reflect the resource itself rather than a transient server condition
+_CACHEABLE_STATUS_CODES = frozenset({200, 206, 403, 404, 410})
+
+_YOUTUBE_ID_RE = re.compile(r'(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]+)')
+_PODCAST_HOSTS = frozenset({'spotify.com', 'podcasts.apple.com', 'anchor.fm', 'soundcloud.com'})
+
+# DNS cache for the validator: batches hit the same few hosts (youtube.com, spotify.com, ...).
+# Only threads marked by _enable_dns_cache (the validator's worker pool) use it; lookups
+# from any other thread, e.g. the Gemini client, go straight to the system resolver.
+_dns_cache = TTLCache(maxsize=DNS_CACHE_SIZE, ttl=DNS_CACHE_TTL)
+_dns_cache_lock = threading.Lock()
+_dns_cache_scope = threading.local()
+_system_getaddrinfo = socket.getaddrinfo
+
+
+def _enable_dns_cache():
+    """Executor initializer: opt the current thread into the DNS cache"""
+    _dns_cache_scope.enabled = True
+
+
+def _cached_getaddrinfo(host, port, family=0, type=0, proto=0, flags=0):
+    """socket.getaddrinfo with successful lookups cached for DNS_CACHE_TTL seconds in opted-in threads"""
+    if not getattr(_dns_cache_scope, 'enabled', False):
+        return _system_getaddrinfo(host, port, family, type, proto, flags)
+    key = (host, port, family, type, proto, flags)
+    with _dns_cache_lock:
+        addresses = _dns_cache.get(key)
+    if addresses is None:
+        addresses = _system_getaddrinfo(host, port, family, type, proto, flags)
+        with _dns_cache_lock:
+            _dns_cache[key] = addresses
+    return addresses
+
+
+def _dispatch_host(parsed) -> str:
+    """Lowercased hostname without 'www.', as used for validator dispatch and cache keys"""
+    return (parsed.hostname or '').removeprefix('www.')
+
+
+def _install_dns_cache():
+    """Hook socket.getaddrinfo (used by requests/urllib3) so validator threads can use the cache"""
+    if socket.getaddrinfo is not _cached_getaddrinfo:
+        socket.getaddrinfo = _cached_getaddrinfo
+
+
+_validator = None
+_validator_lock = threading.Lock()
+
+
+def get_validator() -> 'ContentValidator':
+    """Process-wide ContentValidator, so its session, pools and caches stay warm"""
+    global _validator
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                _validator = ContentValidator()
+    return _validator
 
 
 class ContentValidator:
     """Service for validating content URLs and accessibility"""
     
     def __init__(self):
-        self.session = requests.Session()
+        _install_dns_cache()
+        self.session = self._create_session()
         self.session.headers.update({
             'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
         })
+        # Keep a keep-alive pool for each of the many hosts a batch touches, sized so every
+        # worker thread can hold a connection to the same host without evicting others.
+        # Connection failures are retried once; slow reads are not.
+        adapter = HTTPAdapter(
+            pool_connections=VALIDATION_POOL_HOSTS,
+            pool_maxsize=MAX_VALIDATION_WORKERS * 2,
+            max_retries=Retry(total=1, read=False, backoff_factor=0.1)
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        # Recent validation results (LRU with expiry), shared by the worker threads
+        self._result_cache = TTLCache(maxsize=VALIDATION_CACHE_SIZE, ttl=VALIDATION_CACHE_TTL)
+        self._result_cache_lock = threading.Lock()
+        # Futures for validations currently running, keyed like the result cache
+        self._inflight = {}
+        self._inflight_lock = threading.Lock()
+        # Video hosts with a dedicated validator, keyed by hostname without 'www.'
+        self._video_validators = {
+            'youtube.com': self._validate_youtube_video,
+            'm.youtube.com': self._validate_youtube_video,
+            'youtu.be': self._validate_youtube_video,
+        }
+        # Per-host concurrency limits, created on first use; only recently seen hosts are kept
+        self._host_semaphores = LRUCache(maxsize=MAX_TRACKED_HOSTS)
+        self._host_semaphores_lock = threading.Lock()
+        # Long-lived worker pool shared by every batch, so threads are not spun up per request.
+        # Sized for several concurrent batches; each batch still runs at most
+        # MAX_VALIDATION_WORKERS items at a time (see validate_content_batch).
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=VALIDATION_POOL_WORKERS,
+            thread_name_prefix='url-validator',
+            initializer=_enable_dns_cache
+        )
         
+    def _create_session(self) -> requests.Session:
+        """Session whose responses persist on disk across restarts, when requests-cache is installed"""
+        if requests_cache is None or not VALIDATION_HTTP_CACHE:
+            return requests.Session()
+        os.makedirs(DATA_CACHE_DIR, exist_ok=True)
+        return requests_cache.CachedSession(
+            cache_name=os.path.join(DATA_CACHE_DIR, VALIDATION_HTTP_CACHE),
+            backend='sqlite',
+            expire_after=timedelta(seconds=VALIDATION_HTTP_CACHE_TTL),
+            # GET is left out: caching a response means reading its whole body, which would
+            # defeat the probe's ranged GET against servers that ignore Range
+            allowable_methods=('HEAD',),
+            allowable_codes=(200, 403, 404, 410)
+        )
+    
     def validate_url(self, url: str, content_type: str = None) -> Dict[str, Any]:
         """Validate a single URL and return validation results"""
         validation_result = {
@@ -39,46 +171,124 @@ class ContentValidator:
                 validation_result['error'] = 'Invalid URL format'
                 return validation_result
             
-            # Special handling for different content types
-            if content_type == 'video' and 'youtube.com' in parsed.netloc:
-                return self._validate_youtube_video(url, validation_result)
-            elif content_type == 'video' and 'youtu.be' in parsed.netloc:
-                return self._validate_youtube_video(url, validation_result)
-            elif content_type == 'podcast':
-                return self._validate_podcast(url, validation_result)
-            else:
-                return self._validate_general_url(url, validation_result)
+            # Reuse the result of an earlier check of the same resource
+            cache_key = self._result_cache_key(parsed, content_type)
+            cached = self._get_cached_result(cache_key)
+            if cached is not None:
+                cached['url'] = url
+                return cached
+            
+            # Attach to an identical check already in flight rather than repeating it
+            with self._inflight_lock:
+                pending = self._inflight.get(cache_key)
+                is_owner = pending is None
+                if is_owner:
+                    pending = self._inflight[cache_key] = concurrent.futures.Future()
+            if not is_owner:
+                result = dict(pending.result())
+                result['url'] = url
+                return result
+            
+            try:
+                # Special handling for different content types, capping connections per host
+                host = _dispatch_host(parsed)
+                with self._host_semaphore(parsed.hostname):
+                    if content_type == 'video' and host in self._video_validators:
+                        result = self._video_validators[host](url, validation_result)
+                    elif content_type == 'podcast':
+                        result = self._validate_podcast(url, parsed, validation_result)
+                    else:
+                        result = self._validate_general_url(url, validation_result)
+                
+                # Only remember definitive answers, not throttling, server errors or timeouts
+                if result['status_code'] in _CACHEABLE_STATUS_CODES:
+                    self._store_cached_result(cache_key, result)
+                pending.set_result(result)
+                return result
+            except BaseException as e:
+                pending.set_exception(e)
+                raise
+            finally:
+                with self._inflight_lock:
+                    del self._inflight[cache_key]
                 
         except Exception as e:
             validation_result['error'] = f'Validation error: {str(e)}'
             return validation_result
     
+    def _result_cache_key(self, parsed, content_type: str) -> tuple:
+        """Canonical key for a URL, collapsing youtu.be/X and youtube.com/watch?v=X"""
+        host = _dispatch_host(parsed)
+        if content_type == 'video' and host in self._video_validators:
+            if host == 'youtu.be':
+                return ('youtube', parsed.path.strip('/'))
+            video_id = parse_qs(parsed.query).get('v')
+            if video_id:
+                return ('youtube', video_id[0])
+        return (content_type, parsed.scheme.lower(), parsed.netloc.lower(), parsed.path, parsed.query)
+    
+    def _host_semaphore(self, host: str) -> threading.BoundedSemaphore:
+        """Semaphore limiting concurrent validations against one host"""
+        with self._host_semaphores_lock:
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = self._host_semaphores[host] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+        return semaphore
+    
+    def _get_cached_result(self, key: tuple) -> Dict:
+        """Return a copy of a cached validation result, or None"""
+        with self._result_cache_lock:
+            result = self._result_cache.get(key)
+        return dict(result) if result is not None else None
+    
+    def _store_cached_result(self, key: tuple, result: Dict):
+        """Cache a validation result until it expires or is evicted"""
+        with self._result_cache_lock:
+            self._result_cache[key] = dict(result)
+    
+    def _probe(self, url: str, headers: Dict = None) -> requests.Response:
+        """HEAD the URL, falling back to a one-byte ranged GET for servers that reject HEAD"""
+        try:
+            response = self.session.head(url, timeout=_REQUEST_TIMEOUT,
+                                         allow_redirects=True, headers=headers)
+            if response.status_code not in (405, 501):  # HEAD not allowed / not implemented
+                return response
+        except requests.exceptions.RequestException:
+            pass
+        
+        range_headers = dict(headers or {}, Range='bytes=0-0')
+        response = self.session.get(url, timeout=_REQUEST_TIMEOUT, allow_redirects=True,
+                                    headers=range_headers, stream=True)
+        response.close()  # status and headers are all we need
+        return response
+    
     def _validate_youtube_video(self, url: str, result: Dict) -> Dict:
         """Validate YouTube video specifically"""
         try:
             # Extract video ID
-            video_id_match = re.search(r'(?:youtube\.com/watch\?v=|youtu\.be/)([a-zA-Z0-9_-]+)', url)
+            video_id_match = _YOUTUBE_ID_RE.search(url)
             if not video_id_match:
                 result['error'] = 'Could not extract YouTube video ID'
                 return result
             
             video_id = video_id_match.group(1)
             
-            # Check if video exists by making a HEAD request
-            response = self.session.head(url, timeout=VALIDATION_TIMEOUT, allow_redirects=True)
+            # Check if video exists without downloading the page
+            response = self._probe(url)
             result['status_code'] = response.status_code
             
-            if response.status_code == 200:
+            if response.status_code in (200, 206):
                 result['is_valid'] = True
                 result['content_type_detected'] = 'video'
                 
-                # Try to get the video title for additional verification
+                # Confirm the title via oEmbed (a small JSON document) instead of the full watch page
                 try:
-                    page_response = self.session.get(url, timeout=VALIDATION_TIMEOUT)
-                    if page_response.status_code == 200:
-                        title_match = re.search(r'<title>([^<]+)</title>', page_response.text)
-                        if title_match and 'YouTube' not in title_match.group(1):
-                            result['title_verified'] = True
+                    oembed_response = self.session.get(
+                        f'https://www.youtube.com/oembed?url={quote(url, safe="")}&format=json',
+                        timeout=_REQUEST_TIMEOUT
+                    )
+                    if oembed_response.status_code == 200 and oembed_response.json().get('title'):
+                        result['title_verified'] = True
                 except:
                     pass  # Title verification is optional
                     
@@ -94,18 +304,26 @@ class ContentValidator:
             
         return result
     
-    def _validate_podcast(self, url: str, result: Dict) -> Dict:
+    def _is_podcast_platform(self, parsed) -> bool:
+        """Whether the URL's host (or a parent domain) is a known podcast platform"""
+        host = (parsed.hostname or '').lower()
+        if host == 'apple.com' or host.endswith('.apple.com'):
+            if parsed.path.startswith('/podcasts'):
+                return True
+        labels = host.split('.')
+        return any('.'.join(labels[i:]) in _PODCAST_HOSTS for i in range(len(labels) - 1))
+    
+    def _validate_podcast(self, url: str, parsed, result: Dict) -> Dict:
         """Validate podcast URL"""
         try:
-            response = self.session.head(url, timeout=VALIDATION_TIMEOUT, allow_redirects=True)
+            response = self._probe(url)
             result['status_code'] = response.status_code
             
-            if response.status_code == 200:
+            if response.status_code in (200, 206):
                 content_type = response.headers.get('content-type', '').lower()
                 
                 # Check for common podcast platforms or audio content
-                if (any(platform in url.lower() for platform in ['spotify.com', 'apple.com/podcasts', 'podcasts.apple.com', 'anchor.fm', 'soundcloud.com']) or
-                    'audio/' in content_type):
+                if self._is_podcast_platform(parsed) or 'audio/' in content_type:
                     result['is_valid'] = True
                     result['content_type_detected'] = 'podcast'
                 else:
@@ -123,21 +341,14 @@ class ContentValidator:
     def _validate_general_url(self, url: str, result: Dict) -> Dict:
         """Validate general URLs (articles, academic papers, etc.)"""
         try:
-            #response = self.session.head(url, timeout=VALIDATION_TIMEOUT, allow_redirects=True)
-
             headers = {'User-Agent': 'Mozilla/5.0 (compatible; URL-Validator/1.0)'}
-            try:
-                response = self.session.head(url, timeout=VALIDATION_TIMEOUT, 
-                                        allow_redirects=True, headers=headers)
-            except requests.exceptions.RequestException:
-                # Fallback to GET request
-                response = self.session.get(url, timeout=VALIDATION_TIMEOUT, 
-                                        allow_redirects=True, headers=headers, stream=True)
+            response = self._probe(url, headers)
 
             result['status_code'] = response.status_code
 
-            print(f"Status code result for {url}: {response.status_code}")
-            result['is_valid'] = response.status_code == 200 or response.status_code == 403
+            logger.debug("Status code result for %s: %s (cached: %s)",
+                         url, response.status_code, getattr(response, 'from_cache', False))
+            result['is_valid'] = response.status_code in (200, 206, 403)
 
         except requests.exceptions.Timeout:
             result['error'] = 'URL validation timeout'
@@ -148,7 +359,7 @@ class ContentValidator:
     
     def validate_content_batch(self, content_items: List[Dict]) -> List[Dict]:
         """Validate multiple content items concurrently"""
-        valid_items = []
+        validated_at = datetime.now().isoformat()  # one timestamp for the whole batch
         
         def validate_single_item(item):
             try:
@@ -160,31 +371,43 @@ class ContentValidator:
                 if validation_result['is_valid']:
                     # Add validation metadata to the item
                     item['validation'] = {
-                        'validated_at': datetime.now().isoformat(),
+                        'validated_at': validated_at,
                         'status_code': validation_result['status_code'],
                         'content_type_verified': validation_result.get('content_type_detected')
                     }
                     return item
                 else:
-                    print(f"Invalid content filtered: {item.get('title', 'Unknown')} - {validation_result.get('error', 'Unknown error')}")
+                    logger.info("Invalid content filtered: %s - %s",
+                                item.get('title', 'Unknown'), validation_result.get('error', 'Unknown error'))
                     return None
                     
             except Exception as e:
-                print(f"Validation error for {item.get('title', 'Unknown')}: {str(e)}")
+                logger.warning("Validation error for %s: %s", item.get('title', 'Unknown'), e)
                 return None
         
-        # Use thread pool for concurrent validation
-        with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_VALIDATION_WORKERS) as executor:
-            future_to_item = {executor.submit(validate_single_item, item): item for item in content_items}
-            
-            for future in concurrent.futures.as_completed(future_to_item, timeout=30):
-                try:
-                    result = future.result()
-                    if result is not None:
-                        valid_items.append(result)
-                except Exception as e:
-                    item = future_to_item[future]
-                    print(f"Validation failed for {item.get('title', 'Unknown')}: {str(e)}")
+        # Use the shared thread pool for concurrent validation; validate_single_item
+        # handles its own errors, so results only need filtering
+        deadline = time.monotonic() + VALIDATION_BATCH_TIMEOUT
+        batch_slots = threading.BoundedSemaphore(MAX_VALIDATION_WORKERS)
+        futures = []
+        for item in content_items:
+            # Keep this batch to MAX_VALIDATION_WORKERS in flight so concurrent batches share the pool
+            if not batch_slots.acquire(timeout=max(0, deadline - time.monotonic())):
+                break
+            future = self.executor.submit(validate_single_item, item)
+            future.add_done_callback(lambda _: batch_slots.release())
+            futures.append(future)
+        _, not_done = concurrent.futures.wait(futures, timeout=max(0, deadline - time.monotonic()))
+        
+        # Drop stragglers past the batch deadline; cancelling frees queued work immediately
+        for future in not_done:
+            future.cancel()
+        timed_out = len(not_done) + len(content_items) - len(futures)
+        if timed_out:
+            logger.warning("Content validation: %d items timed out", timed_out)
+        
+        valid_items = [future.result() for future in futures
+                       if future not in not_done and future.result() is not None]
         
-        print(f"Content validation: {len(valid_items)}/{len(content_items)} items passed validation")
+        logger.info("Content validation: %d/%d items passed validation", len(valid_items), len(content_items))
         return valid_items
@@ -1,23 +1,30 @@
 """
 Content item data model.
 """
-from dataclasses import dataclass
 from datetime import datetime
 from typing import Dict, Optional
 
 
-@dataclass
 class ContentItem:
-    """Data class for content items"""
-    title: str
-    type: str  # article, video, podcast, academic
-    description: str
-    source: str
-    relevance: str
-    url: str = None  # URL for the "read more" link
-    timestamp: str = None
-    validation: Optional[Dict] = None
-    
-    def __post_init__(self):
-        if self.timestamp is None:
-            self.timestamp = datetime.now().isoformat()
+    """Content item with fixed slots, so instances carry no per-object __dict__"""
+    __slots__ = ('title', 'type', 'description', 'source', 'relevance', 'url', 'timestamp', 'validation')
+
+    def __init__(self, title: str, type: str, description: str, source: str, relevance: str,
+                 url: str = None, timestamp: str = None, validation: Optional[Dict] = None):
+        self.title = title
+        self.type = type  # article, video, podcast, academic
+        self.description = description
+        self.source = source
+        self.relevance = relevance
+        self.url = url  # URL for the "read more" link
+        self.timestamp = timestamp if timestamp is not None else datetime.now().isoformat()
+        self.validation = validation
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"ContentItem({fields})"
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
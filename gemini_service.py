@@ -3,6 +3,10 @@ Gemini API service for content discovery and recommendations.
 """
 import hashlib
 import json
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from typing import Dict, List, Tuple
 
 import google.genai as genai
@@ -10,9 +14,125 @@ from google.genai import types
 import re
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
-from config import SOURCE_CONSTRAINTS, SYSTEM_INSTRUCTIONS
-from data_models import ContentItem
-from content_validator import ContentValidator
+try:
+    import orjson
+except ImportError:  # fall back to the stdlib parser
+    orjson = None
+
+try:
+    import diskcache
+except ImportError:  # link lookups are then only deduplicated per call
+    diskcache = None
+
+from config import (
+    SOURCE_CONSTRAINTS, LINK_LOOKUP_WORKERS, LINK_POOL_WORKERS, LINK_CACHE_DIR, LINK_CACHE_TTL, MAX_CHAT_SESSIONS,
+    get_system_instructions
+)
+from content_validator import get_validator
+
+logger = logging.getLogger('gemini_service')
+
+# Grounding metadata patterns stripped from descriptions, compiled once
+# Matches [General search 2, Meta search 1, ...] style metadata
+_SEARCH_METADATA_RE = re.compile(r'\[(?:General search \d+,?\s*|Meta search \d+,?\s*)+\]')
+# Matches other common metadata patterns like [Search 1], [Result 2], etc.
+_SIMPLE_METADATA_RE = re.compile(r'\[(?:Search|Result|Source|Reference)\s*\d+\]')
+# Matches citation patterns like [1, 2, 4, 5] or [1] or [1, 2] etc.
+_CITATION_RE = re.compile(r'\[\s*\d+(?:\s*,\s*\d+)*\s*\]')
+# Matches other citation formats like [General 1, Meta 2]
+_COMPLEX_CITATION_RE = re.compile(r'\[(?:\w+\s+\d+(?:\s*,\s*\w+\s+\d+)*)\]')
+# All of the above as one alternation, so the text is scanned and copied once
+_METADATA_RE = re.compile('|'.join(pattern.pattern for pattern in (
+    _SEARCH_METADATA_RE, _SIMPLE_METADATA_RE, _CITATION_RE, _COMPLEX_CITATION_RE
+)))
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers catch either the same way
+_json_loads = orjson.loads if orjson is not None else json.loads
+# raw_decode parses a JSON value starting mid-string and reports where it ended
+_JSON_DECODER = json.JSONDecoder()
+
+# Tool declarations are immutable, so every request shares the same objects
+_GOOGLE_SEARCH_TOOL = types.Tool(google_search=types.GoogleSearch())
+_URL_CONTEXT_TOOL = types.Tool(url_context={})
+
+# Request configs are validated on construction; build the constant ones once
+_URL_LOOKUP_CONFIG = types.GenerateContentConfig(
+    tools=[_GOOGLE_SEARCH_TOOL, _URL_CONTEXT_TOOL],
+    system_instruction="You are focused on finding reputable and working links to the content provided by the user.",
+    stop_sequences=["]"]
+)
+_CHAT_CONFIG = types.GenerateContentConfig(
+    tools=[_GOOGLE_SEARCH_TOOL, _URL_CONTEXT_TOOL],
+    temperature=0.7,
+    max_output_tokens=4000,
+    top_p=0.8,
+    thinking_config=types.ThinkingConfig(
+        include_thoughts=True,
+        thinking_budget=512
+    )
+)
+
+
+# The results configs embed the dated system instructions, so they are cached per day's text
+@lru_cache(maxsize=2)
+def _results_config(system_instruction: str) -> types.GenerateContentConfig:
+    """Config for one-shot search/recommendation calls"""
+    return types.GenerateContentConfig(
+        tools=[_GOOGLE_SEARCH_TOOL],
+        system_instruction=system_instruction,
+        thinking_config=types.ThinkingConfig(
+            include_thoughts=True
+        )
+    )
+
+
+@lru_cache(maxsize=2)
+def _streaming_results_config(system_instruction: str) -> types.GenerateContentConfig:
+    """Config for streamed search/recommendation calls"""
+    return types.GenerateContentConfig(
+        tools=[_GOOGLE_SEARCH_TOOL, _URL_CONTEXT_TOOL],
+        system_instruction=system_instruction,
+        thinking_config=types.ThinkingConfig(
+            thinking_budget=256,
+            include_thoughts=True
+        )
+    )
+
+# Article-independent chat instructions; the article itself is introduced once in the chat history
+_CHAT_INSTRUCTIONS = """
+        You are an AI assistant helping users dive deeper into news articles and developments. 
+        
+        Instructions:
+        - You have access to web search tools and URL context tools - use them to read the actual article content from the URL provided
+        - Provide insightful, contextual information about the article
+        - If asked about developments leading up to the news, research relevant background events
+        - If asked about competitors, provide specific companies, metrics, market data, and information about competitorsfrom reputable articles
+        - Keep responses conversational but informative
+        - Reference the article content when relevant
+        - If you don't have specific information, acknowledge limitations and suggest where the user might find more details
+        """
+
+
+@lru_cache(maxsize=1024)
+def _chat_id_for(title: str, url: str) -> str:
+    """Hash title + URL into a chat ID; cached so repeat messages skip the digest"""
+    return f"article_{hashlib.sha256((title + url).encode()).hexdigest()[:32]}"
+
+
+def article_chat_id(article: Dict) -> str:
+    """Derive the persistent chat session ID for an article.
+
+    Must match generateChatId() in chat.js (first 32 hex chars of SHA-256
+    over title + URL) so the frontend can look up the same session's history.
+    """
+    return _chat_id_for(article.get('title', ''), article.get('url', ''))
+
+
+@lru_cache(maxsize=32)
+def _get_client(api_key: str) -> genai.Client:
+    """One client per API key, so its HTTP connection pool stays warm between calls"""
+    return genai.Client(api_key=api_key)
 
 
 class GeminiContentService:
@@ -21,41 +141,38 @@ class GeminiContentService:
     def __init__(self):
         self.api_key = None
         self.source_constraints = self._get_source_constraints()
-        self.system_instructions_for_top_level = self._get_system_instructions()
-        self.validator = ContentValidator()
-        # Store active chat sessions for multi-turn conversations
-        self.active_chats = {}
+        # Rendered prompts are cached per instance; a class-level cache would key on self and pin it forever
+        self._render_prompt = lru_cache(maxsize=128)(self._render_prompt_text)
+        self.validator = get_validator()
+        # Shared, bounded pool for link lookups; keeps concurrent calls under Gemini's QPS limits
+        self._link_pool = ThreadPoolExecutor(max_workers=LINK_POOL_WORKERS, thread_name_prefix='gemini-links')
+        # Grounded links by (title, source), kept on disk so they survive restarts
+        self._link_cache = diskcache.Cache(LINK_CACHE_DIR) if diskcache is not None and LINK_CACHE_DIR else None
+        # Store active chat sessions for multi-turn conversations, least recently used first
+        self.active_chats = OrderedDict()
+        self._chats_lock = threading.Lock()
     
     def _clean_metadata_from_text(self, text: str) -> str:
         """Remove grounding metadata patterns from text"""
         if not text:
             return text
         
-        # Pattern to match [General search 2, Meta search 1, ...] style metadata
-        metadata_pattern = r'\[(?:General search \d+,?\s*|Meta search \d+,?\s*)+\]'
-        cleaned_text = re.sub(metadata_pattern, '', text)
-        
-        # Pattern to match other common metadata patterns like [Search 1], [Result 2], etc.
-        simple_metadata_pattern = r'\[(?:Search|Result|Source|Reference)\s*\d+\]'
-        cleaned_text = re.sub(simple_metadata_pattern, '', cleaned_text)
-        
-        # Pattern to match citation patterns like [1, 2, 4, 5] or [1] or [1, 2] etc.
-        citation_pattern = r'\[\s*\d+(?:\s*,\s*\d+)*\s*\]'
-        cleaned_text = re.sub(citation_pattern, '', cleaned_text)
-        
-        # Pattern to match other citation formats like [General 1, Meta 2] 
-        complex_citation_pattern = r'\[(?:\w+\s+\d+(?:\s*,\s*\w+\s+\d+)*)\]'
-        cleaned_text = re.sub(complex_citation_pattern, '', cleaned_text)
+        cleaned_text = _METADATA_RE.sub('', text)
         
         # Clean up extra whitespace that might be left behind
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text).strip()
+        cleaned_text = _WHITESPACE_RE.sub(' ', cleaned_text).strip()
         
         return cleaned_text
     
     def set_api_key(self, api_key: str):
         """Set the API key for Gemini"""
         self.api_key = api_key
-        genai.Client(api_key=api_key)
+        _get_client(api_key)
+    
+    def reset_api_key(self):
+        """Forget the configured API key and every cached client holding a key"""
+        self.api_key = None
+        _get_client.cache_clear()
     
     def _get_source_constraints(self) -> str:
         """Get the strict source requirements"""
@@ -66,18 +183,30 @@ class GeminiContentService:
     def _get_system_instructions(self) -> str:
         """Get the system instructions"""
         return f"""        
-        {SYSTEM_INSTRUCTIONS}
+        {get_system_instructions()}
         """
+
+    @property
+    def system_instructions_for_top_level(self) -> str:
+        """System instructions for top-level calls, kept current with today's date"""
+        return self._get_system_instructions()
     
     def _generate_cache_key(self, query: str, is_recommendation: bool, memory_context: str) -> str:
         """Generate a cache key for the request"""
-        content = f"{'rec' if is_recommendation else 'search'}_{query}_{memory_context}"
-        return hashlib.md5(content.encode()).hexdigest()
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(b'rec_' if is_recommendation else b'search_')
+        digest.update(query.encode())
+        digest.update(b'_')
+        digest.update(memory_context.encode())
+        return digest.hexdigest()
     
     def _build_prompt(self, query: str, is_recommendation: bool, memory_context: Dict) -> str:
         """Build the prompt for Gemini API"""
-        memory_str = json.dumps(memory_context, indent=2)
-        
+        # Dicts aren't hashable; the serialized form doubles as the cache key
+        return self._render_prompt(query, is_recommendation, json.dumps(memory_context, indent=2))
+    
+    def _render_prompt_text(self, query: str, is_recommendation: bool, memory_str: str) -> str:
+        """Render the prompt text; called through the per-instance _render_prompt cache"""
         if is_recommendation:
             base_prompt = f"""
             Our goal is to stay on top of the latest AI news and content without needing to endlessly scroll news sites and X. 
@@ -149,25 +278,15 @@ class GeminiContentService:
         Return ONLY the JSON array, no additional text. Make sure your final response is valid JSON that can be parsed.
         """
     
-    def _call_gemini_api_for_results(self, model: str, prompt: str) -> List[Dict]:  
+    def _call_gemini_api_for_results(self, model: str, prompt: str, api_key: str = None) -> List[Dict]:  
         """Call Gemini API with web search tool using the official SDK"""
-        if not self.api_key:
+        api_key = api_key or self.api_key
+        if not api_key:
             raise ValueError("API key not configured")
         
         try:
-            # Create the model with grounding tools
-            client = genai.Client(api_key=self.api_key)
-            grounding_tool = types.Tool(
-                google_search=types.GoogleSearch()
-            )
-
-            config = types.GenerateContentConfig(
-                tools=[grounding_tool],
-                system_instruction=self.system_instructions_for_top_level,
-                thinking_config=types.ThinkingConfig(
-                    include_thoughts=True
-                )
-            )
+            client = _get_client(api_key)
+            config = _results_config(self.system_instructions_for_top_level)
             
             response = client.models.generate_content(
                 model=model,
@@ -175,48 +294,34 @@ class GeminiContentService:
                 config=config,
             )
 
-            print(f"Response grounding metadata: {response.candidates[0].grounding_metadata}")
+            logger.debug("Response grounding metadata: %s", response.candidates[0].grounding_metadata)
 
             if response.candidates[0].finish_reason:
-                print(f"Finish reason: {response.candidates[0].finish_reason}")
+                logger.debug("Finish reason: %s", response.candidates[0].finish_reason)
             
             # Parse the response
             return self._parse_gemini_response_sdk(response)
             
         except Exception as e:
-            print(f"Error calling Gemini API for results: {e}")
+            logger.warning("Error calling Gemini API for results: %s", e)
             # Return mock data for demonstration
             return self._get_mock_results()
     
-    def _call_gemini_api_for_results_streaming(self, model: str, prompt: str):
+    def _call_gemini_api_for_results_streaming(self, model: str, prompt: str, api_key: str = None):
         """Call Gemini API with web search tool using streaming"""
-        if not self.api_key:
-            print("No API key configured, using mock streaming response")
+        api_key = api_key or self.api_key
+        if not api_key:
+            logger.info("No API key configured, using mock streaming response")
             # Use mock streaming response when no API key
             for chunk in self._create_mock_streaming_response():
                 yield chunk
             return
         
         try:
-            # Create the model with grounding tools
-            client = genai.Client(api_key=self.api_key)
-            grounding_tool = types.Tool(
-                google_search=types.GoogleSearch()
-            )
-            url_context_tool = types.Tool(
-                url_context={}
-            )
-
-            config = types.GenerateContentConfig(
-                tools=[grounding_tool, url_context_tool],
-                system_instruction=self.system_instructions_for_top_level,
-                thinking_config=types.ThinkingConfig(
-                    thinking_budget=256,
-                    include_thoughts=True
-                )
-            )
+            client = _get_client(api_key)
+            config = _streaming_results_config(self.system_instructions_for_top_level)
             
-            print(f"Calling Gemini API for results streaming")
+            logger.debug("Calling Gemini API for results streaming")
             response_stream = client.models.generate_content_stream(
                 model=model,
                 contents=prompt,
@@ -228,77 +333,64 @@ class GeminiContentService:
                 yield chunk
             
         except Exception as e:
-            print(f"Error calling Gemini API for search results streaming: {e}")
+            logger.warning("Error calling Gemini API for search results streaming: %s", e)
             # Yield mock data for demonstration
             for chunk in self._create_mock_streaming_response():
                 yield chunk
 
-    def _call_gemini_api_for_url(self, model: str, prompt: str) -> str:
+    def _call_gemini_api_for_url(self, model: str, prompt: str, api_key: str = None) -> str:
         """Call Gemini API with web search tool using the official SDK"""
-        if not self.api_key:
+        api_key = api_key or self.api_key
+        if not api_key:
             raise ValueError("API key not configured")
         
         try:
-            # Create the model with grounding tools
-            client = genai.Client(api_key=self.api_key)
-            grounding_tool = types.Tool(
-                google_search=types.GoogleSearch(),
-            )
-
-            url_context_tool = {"url_context": {}}
-            config = types.GenerateContentConfig(
-                tools=[grounding_tool, url_context_tool],
-                system_instruction="You are focused on finding reputable and working links to the content provided by the user.",
-                stop_sequences=["]"]
-            )
-            
+            client = _get_client(api_key)
             response = client.models.generate_content(
                 model=model,
                 contents=prompt,
-                config=config,
+                config=_URL_LOOKUP_CONFIG,
             )
             
             # Parse the response
             return response
             
         except Exception as e:
-            print(f"Error calling Gemini API for URLs: {e}")
+            logger.warning("Error calling Gemini API for URLs: %s", e)
             # Return mock data for demonstration
             return self._get_mock_results()
     
     def _parse_gemini_response_sdk(self, response) -> List[Dict]:
         """Parse the response from Gemini API using SDK"""
-        print(f"Parsing Gemini API Response: {response.text}")
         try:
             response_text = response.text
+            logger.debug("Parsing Gemini API Response: %s", response_text)
             
-            # Strip off everything besides the list of dictionaries
+            # Parse the list of dictionaries in place, stopping at its closing bracket
             opening_list_index = response_text.find('[')
-            closing_list_index = response_text.rfind(']')
-            if opening_list_index != -1 and closing_list_index != -1:
-                stripped_response_text = response_text[opening_list_index:closing_list_index + 1]
+            if opening_list_index == -1:
+                dict_list = _json_loads(response_text)
             else:
-                stripped_response_text = response_text
-            
-            print("Stripped response text:")
-            print(stripped_response_text)
-
-            # Parses the string and returns the corresponding python object
-            dict_list = json.loads(stripped_response_text)
+                try:
+                    dict_list, _ = _JSON_DECODER.raw_decode(response_text, opening_list_index)
+                except json.JSONDecodeError:
+                    # The first '[' may belong to prose; fall back to the outermost brackets
+                    closing_list_index = response_text.rfind(']')
+                    dict_list = _json_loads(response_text[opening_list_index:closing_list_index + 1])
 
             # Check if the result is a list and if its elements are dictionaries
             if isinstance(dict_list, list) and all(isinstance(item, dict) for item in dict_list):
                 return dict_list
             else:
-                print("Error: The string content is valid JSON, but it does not represent a list of dictionaries.")
+                logger.warning("The string content is valid JSON, but it does not represent a list of dictionaries.")
                 return []
         except json.JSONDecodeError as e:
             # Catch a specific error if the string is not valid JSON
-            print(f"Error decoding JSON: {e}")
+            logger.warning("Error decoding JSON: %s", e)
             return []
             
         except Exception as e:
-            print(f"Error parsing Gemini SDK response: {e}")
+            logger.warning("Error parsing Gemini SDK response: %s", e)
             return self._get_mock_results()
     
     def _get_mock_results(self) -> List[Dict]:
@@ -368,37 +460,48 @@ class GeminiContentService:
         # Then yield results chunk
         yield MockChunk(results_text, None)
     
-    def search_content_streaming(self, query: str, memory_context: Dict):
+    def search_content_streaming(self, query: str, memory_context: Dict, api_key: str = None):
         """Search for content with streaming responses"""
-        print(f"Gemini service starting streaming search for: {query}")
+        logger.debug("Gemini service starting streaming search for: %s", query)
+        if not (api_key or self.api_key):
+            # Mock output doesn't need a prompt
+            yield from self._create_mock_streaming_response()
+            return
+        
         # Build prompt and call streaming API
         prompt = self._build_prompt(query, False, memory_context)
         
         # Stream responses
-        for chunk in self._call_gemini_api_for_results_streaming("gemini-2.5-pro", prompt):
-            print(f"Gemini service yielding chunk: {type(chunk)}")
-            yield chunk
-        print(f"Gemini service finished streaming for: {query}")
+        yield from self._call_gemini_api_for_results_streaming("gemini-2.5-pro", prompt, api_key)
+        logger.debug("Gemini service finished streaming for: %s", query)
     
-    def get_recommendations_streaming(self, memory_context: Dict):
+    def get_recommendations_streaming(self, memory_context: Dict, api_key: str = None):
         """Get personalized recommendations with streaming responses"""
-        print(f"Gemini service starting streaming recommendations")
+        logger.debug("Gemini service starting streaming recommendations")
+        if not (api_key or self.api_key):
+            # Mock output doesn't need a prompt
+            yield from self._create_mock_streaming_response()
+            return
+        
         # Build prompt and call streaming API  
         prompt = self._build_prompt("", True, memory_context)
         
         # Stream responses
-        for chunk in self._call_gemini_api_for_results_streaming("gemini-2.5-pro", prompt):
-            # print(f"Gemini service yielding recommendations chunk: {type(chunk)}")
-            yield chunk
-        print(f"Gemini service finished streaming recommendations")
+        yield from self._call_gemini_api_for_results_streaming("gemini-2.5-pro", prompt, api_key)
+        logger.debug("Gemini service finished streaming recommendations")
 
-    def generate_links_by_title_parallel(self, content_items: List[Dict]) -> Dict[str, List[str]]:
+    def generate_links_by_title_parallel(self, content_items: List[Dict], api_key: str = None) -> Dict[str, List[str]]:
         """Parallel version using ThreadPoolExecutor"""
         def process_single_item(item: Dict) -> Tuple[str, List[str]]:
             """Process a single content item and return (title, links)"""
-            content_item = ContentItem(**item)
-            title = content_item.title
-            source = content_item.source
+            title = item.get('title', '')
+            source = item.get('source', '')
+            
+            cache_key = (title, source)
+            if self._link_cache is not None:
+                cached_links = self._link_cache.get(cache_key)
+                if cached_links is not None:
+                    return title, cached_links
             
             prompt = f"""
             Can you find me the right citation link for this article and this source?
@@ -406,83 +509,66 @@ class GeminiContentService:
             Source: {source}
             """
             
-            response = self._call_gemini_api_for_url("gemini-2.5-pro", prompt)
+            response = self._call_gemini_api_for_url("gemini-2.5-pro", prompt, api_key)
             results_data = response.text
             grounding_metadata = response.candidates[0].grounding_metadata
             
             if not grounding_metadata.grounding_chunks:
-                print(f"No grounding chunks for {title} and {source}")
+                logger.info("No grounding chunks for %s and %s", title, source)
                 return title, [f"https://google.com/search?q={title} {source}"]
             
             links = []
             for grounding_chunk in grounding_metadata.grounding_chunks:
                 links.append(grounding_chunk.web.uri)
             
+            if self._link_cache is not None:
+                self._link_cache.set(cache_key, links, expire=LINK_CACHE_TTL)
             return title, links
         
         links = {}
         
-        # Use ThreadPoolExecutor to process items in parallel
-        with ThreadPoolExecutor(max_workers=min(len(content_items), 10)) as executor:
-            # Submit all tasks
-            future_to_item = {executor.submit(process_single_item, item): item for item in content_items}
-            
-            # Process completed tasks
-            for future in as_completed(future_to_item):
-                try:
-                    title, item_links = future.result()
-                    links[title] = item_links
-                except Exception as exc:
-                    item = future_to_item[future]
-                    content_item = ContentItem(**item)
-                    title = content_item.title
-                    print(f"Error processing {title}: {exc}")
-                    links[title] = [f"https://google.com/search?q={title} {content_item.source}"]
+        # Results are keyed by title, so look each distinct title up only once
+        unique_items = {}
+        for item in content_items:
+            unique_items.setdefault(item.get('title'), item)
+        
+        # Use the shared pool, bounding how many lookups this request runs at once
+        request_slots = threading.BoundedSemaphore(LINK_LOOKUP_WORKERS)
+        future_to_item = {}
+        for item in unique_items.values():
+            request_slots.acquire()
+            future = self._link_pool.submit(process_single_item, item)
+            future.add_done_callback(lambda _: request_slots.release())
+            future_to_item[future] = item
+        
+        # Process completed tasks
+        for future in as_completed(future_to_item):
+            try:
+                title, item_links = future.result()
+                links[title] = item_links
+            except Exception as exc:
+                item = future_to_item[future]
+                title = item.get('title', '')
+                logger.warning("Error processing %s: %s", title, exc)
+                links[title] = [f"https://google.com/search?q={title} {item.get('source', '')}"]
         
         return links
 
-    def _get_or_create_chat_session(self, chat_id: str, article: Dict):
+    def _get_or_create_chat_session(self, chat_id: str, article: Dict, api_key: str = None):
         """Get existing chat session or create a new one for the conversation"""
-        if chat_id in self.active_chats:
-            return self.active_chats[chat_id]
-        
-        # Build system instruction with article context
-        system_instruction = f"""
-        You are an AI assistant helping users dive deeper into news articles and developments. 
-        
-        Article Information:
-        Title: {article.get('title', '')}
-        Description: {article.get('description', '')}
-        Source: {article.get('source', '')}
-        Type: {article.get('type', '')}
-        URL: {article.get('url', '')}
-        
-        Instructions:
-        - You have access to web search tools and URL context tools - use them to read the actual article content from the URL provided
-        - Provide insightful, contextual information about the article
-        - If asked about developments leading up to the news, research relevant background events
-        - If asked about competitors, provide specific companies, metrics, market data, and information about competitorsfrom reputable articles
-        - Keep responses conversational but informative
-        - Reference the article content when relevant
-        - If you don't have specific information, acknowledge limitations and suggest where the user might find more details
-        """
+        with self._chats_lock:
+            if chat_id in self.active_chats:
+                self.active_chats.move_to_end(chat_id)
+                return self.active_chats[chat_id]
         
-        # Create chat client
-        client = genai.Client(api_key=self.api_key)
-        
-        # Add grounding tools for web search and URL context
-        grounding_tool = types.Tool(
-            google_search=types.GoogleSearch()
-        )
-        url_context_tool = types.Tool(
-            url_context={}
-        )
+        # Reuse the client for this key; chats get web search and URL context tools
+        client = _get_client(api_key or self.api_key)
         
         # Initial history with system instruction and article context
         initial_history = [
             {
                 "role": "user",
-                "parts": [{"text": "Please act according to these instructions: " + system_instruction}]
+                "parts": [{"text": "Please act according to these instructions: " + _CHAT_INSTRUCTIONS}]
             },
             {
                 "role": "model", 
@@ -512,26 +598,19 @@ class GeminiContentService:
         chat = client.chats.create(
             model="gemini-2.5-pro",
             history=initial_history,
-            config=types.GenerateContentConfig(
-                tools=[grounding_tool, url_context_tool],
-                temperature=0.7,
-                max_output_tokens=4000,
-                top_p=0.8,
-                thinking_config=types.ThinkingConfig(
-                    include_thoughts=True,
-                    thinking_budget=512
-                )
-            )
+            config=_CHAT_CONFIG
         )
         
-        # Store the chat session
-        self.active_chats[chat_id] = chat
+        # Store the chat session, dropping the least recently used beyond the cap
+        with self._chats_lock:
+            self.active_chats[chat_id] = chat
+            while len(self.active_chats) > MAX_CHAT_SESSIONS:
+                self.active_chats.popitem(last=False)
         return chat
 
     def clear_chat_session(self, chat_id: str):
         """Clear a specific chat session"""
-        if chat_id in self.active_chats:
-            del self.active_chats[chat_id]
+        self.active_chats.pop(chat_id, None)
 
     def clear_all_chat_sessions(self):
         """Clear all chat sessions"""
@@ -539,8 +618,8 @@ class GeminiContentService:
 
     def get_chat_history(self, chat_id: str):
         """Get the chat history for a specific chat session"""
-        if chat_id in self.active_chats:
-            chat = self.active_chats[chat_id]
+        chat = self.active_chats.get(chat_id)
+        if chat is not None:
             try:
                 # Get the chat history from the Gemini chat session
                 history = chat.get_history(True)  # True for structured format
@@ -554,8 +633,9 @@ class GeminiContentService:
                         if role in ['user', 'model']:
                             content = ''
                             if message.parts:
-                                # Combine all text parts
-                                content = ''.join([part.text for part in message.parts if hasattr(part, 'text')])
+                                # Combine all text parts; single-part messages skip the join
+                                texts = [part.text for part in message.parts if getattr(part, 'text', None)]
+                                content = texts[0] if len(texts) == 1 else ''.join(texts)
                             
                             # Convert model role to assistant for frontend consistency
                             frontend_role = 'assistant' if role == 'model' else role
@@ -566,26 +646,26 @@ class GeminiContentService:
                                     'role': frontend_role,
                                     'content': content.strip()
                                 })
-                                print(f"Added message to history: {frontend_role} - {content[:100]}...")
+                                logger.debug("Added message to history: %s - %s...", frontend_role, content[:100])
                 
                 return formatted_history
             except Exception as e:
-                print(f"Error getting chat history: {e}")
+                logger.warning("Error getting chat history: %s", e)
                 return []
         else:
             return []
 
-    def chat_about_article_streaming(self, message: str, article: Dict, conversation_history: List[Dict], chat_id: str = None):
+    def chat_about_article_streaming(self, message: str, article: Dict, conversation_history: List[Dict], chat_id: str = None, api_key: str = None):
         """Generate a streaming conversational response about a specific article using persistent chat session"""
         try:
             # Generate chat_id if not provided (based on article for session persistence)
             if not chat_id:
-                chat_id = f"article_{hashlib.md5(str(article.get('title', '') + article.get('url', '')).encode()).hexdigest()}"
+                chat_id = article_chat_id(article)
             
-            print(f"Using chat session ID: {chat_id}")
+            logger.debug("Using chat session ID: %s", chat_id)
             
             # Get or create persistent chat session
-            chat = self._get_or_create_chat_session(chat_id, article)
+            chat = self._get_or_create_chat_session(chat_id, article, api_key)
             
             # Send the current message and get streaming response
             response_stream = chat.send_message_stream(message)
@@ -597,16 +677,14 @@ class GeminiContentService:
                     candidate = chunk.candidates[0]
                     if hasattr(candidate, 'finish_reason') and candidate.finish_reason:
                         finish_reason = str(candidate.finish_reason)
-                        print(f"Chat finish reason: {finish_reason}")
+                        logger.debug("Chat finish reason: %s", finish_reason)
                         if 'MAX_TOKENS' in finish_reason or 'LENGTH' in finish_reason:
-                            print(f"Response may be truncated due to token limit!")
+                            logger.warning("Response may be truncated due to token limit!")
                 
                 yield chunk
             
         except Exception as e:
-            print(f"Error in chat_about_article_streaming: {e}")
-            import traceback
-            print(f"Full traceback: {traceback.format_exc()}")
+            logger.exception("Error in chat_about_article_streaming: %s", e)
             
             # Return a fallback response as a mock chunk
             class MockChunk:
@@ -41,4 +41,17 @@ echo "Press Ctrl+C to stop both servers"
 echo ""
 
 # Start the Flask backend (which also serves the frontend)
-python3 backend.py
+if [ "$(echo "${DEBUG:-false}" | tr '[:upper:]' '[:lower:]')" = "true" ]; then
+    python3 backend.py
+else
+    # Chat sessions live in process memory, so run a single worker process and
+    # serve concurrent SSE streams from its threads. gunicorn imports the app only
+    # in the worker, so services are built once.
+    exec gunicorn \
+        --worker-class gthread \
+        --workers 1 \
+        --threads "${SERVER_THREADS:-32}" \
+        --bind "0.0.0.0:${PORT:-8001}" \
+        --timeout 120 \
+        backend:app
+fi